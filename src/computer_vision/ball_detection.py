@@ -1,94 +1,284 @@
-from computer_vision.transforms import scale_pixels_to_centimeters, camera_view_to_plate_view
+from computer_vision.transforms import PLATE_RADIUS_CM, pixels_to_centimeters_scale
 import cv2
+import math
 import numpy as np
+import sys
+import threading
 
 QUEUE_SIZE = 7
 
+# Pick the native capture backend explicitly rather than letting OpenCV probe
+CAPTURE_BACKENDS = {
+    "linux": cv2.CAP_V4L2,
+    "darwin": cv2.CAP_AVFOUNDATION,
+    "win32": cv2.CAP_MSMF,
+}
+
+# Hough accumulator cost scales with pixel count, and the ball is large enough
+# (minRadius=40 at full res) that half resolution keeps detection reliable
+DOWNSCALE_FACTOR = 2
+
+# Accumulator threshold is adapted at runtime to track lighting drift,
+# aiming for exactly one detected circle per frame
+HOUGH_PARAM2_INIT = 25
+HOUGH_PARAM2_MIN = 10
+HOUGH_PARAM2_MAX = 60
+HOUGH_PARAM2_STEP = 2
+HOUGH_BLUR_SIGMA = 2
+HOUGH_BLUR_SIGMA_WIDE = 3
+
+# The ball moves a few pixels per frame at ~10 Hz, so search a box of
+# 3 * maxRadius a side around the last detection instead of the whole frame
+ROI_HALF_WIDTH = 60  # downscaled pixels
+
+# imshow + waitKey(1) cost ~1 ms each call; rendering every Nth frame is
+# plenty for a human watching the preview window
+PREVIEW_EVERY_N_FRAMES = 5
+
+# Hough only needs one channel for gradients, so skip the weighted BGR -> GRAY
+# sum and read a single plane. Green has the best SNR on most sensors; switch
+# to 2 (red) or 0 (blue) if the ball colour contrasts better there
+GRAY_CHANNEL = 1
+
+# There is exactly one ball of a known colour on the plate, so an HSV threshold
+# + mask centroid (one linear pass) is the primary detector; Hough only runs
+# when too few pixels match the mask (occlusion, lighting outside the bounds).
+# Bounds cover the orange ping-pong ball; retune for other ball colours.
+BALL_HSV_LOWER = np.array([5, 120, 120], np.uint8)
+BALL_HSV_UPPER = np.array([20, 255, 255], np.uint8)
+MIN_MASK_AREA = 400  # full-resolution pixels
+
 
 class BallDetector:
-    def __init__(self, camera_index=0, preview=False, memory=False):
-        self.cap = cv2.VideoCapture(camera_index)
+    def __init__(self, camera_index=0, preview=False, memory=False, moving_average=False):
+        self.cap = cv2.VideoCapture(camera_index, CAPTURE_BACKENDS.get(sys.platform, cv2.CAP_ANY))
         self.RES_WIDTH = 480
         self.RES_HEIGHT = 480
         self.WINDOW_NAME = "Ball Detection"
+        # MJPEG keeps USB transfers compressed (5-10x less bandwidth than YUYV),
+        # cutting kernel -> user copy cost per read
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.RES_WIDTH)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.RES_HEIGHT)
+
+        # Keep only the newest frame in the driver queue so a read never returns a stale frame
+        self._grab_thread = None
+        if not self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+            # Some backends (e.g. AVFoundation) ignore the buffer size, so drain the
+            # queue ourselves: grab continuously and hand out the latest frame only
+            print("Failed to reduce capture buffer size, falling back to grab thread")
+            self._latest_frame = None
+            self._frame_lock = threading.Lock()
+            self._grab_thread = threading.Thread(target=self._grab_frames, daemon=True)
+            self._grab_thread.start()
+
+        # Scratch buffers reused across frames via the cv2 dst= parameter, so the
+        # steady-state detection path allocates nothing and stays hot in cache
+        small_shape = (self.RES_HEIGHT // DOWNSCALE_FACTOR, self.RES_WIDTH // DOWNSCALE_FACTOR)
+        self._frame_buf = np.empty((self.RES_HEIGHT, self.RES_WIDTH, 3), np.uint8)
+        self._gray = np.empty((self.RES_HEIGHT, self.RES_WIDTH), np.uint8)
+        self._gray_small = np.empty(small_shape, np.uint8)
+        self._blurred = np.empty(small_shape, np.uint8)
+        self._hsv = np.empty((self.RES_HEIGHT, self.RES_WIDTH, 3), np.uint8)
+        self._mask = np.empty((self.RES_HEIGHT, self.RES_WIDTH), np.uint8)
+
+        self._px_to_cm = pixels_to_centimeters_scale(self.RES_HEIGHT)
+        self._param2 = HOUGH_PARAM2_INIT
+        self._param2_step = 0  # last adjustment direction, to detect oscillation
+        self._blur_sigma = HOUGH_BLUR_SIGMA
+        self._last_center = None  # last detected center in downscaled pixels, seeds the ROI
+
         self.preview = preview
+        self._preview_counter = 0
         self.memory = memory
         if self.memory:
             self.last_ball_position = (0.0, 0.0)
 
-        # self.moving_avg_queue = deque()
-        # total = [0.0, 0.0]
-        # for _ in range(QUEUE_SIZE):
-        #     ball_pos = self._get_ball_position_top_view()
-        #     self.moving_avg_queue.append(ball_pos)
-        #     total[0] += ball_pos[0]
-        #     total[1] += ball_pos[1]
-        # self.moving_avg = [total[0] / QUEUE_SIZE, total[1] / QUEUE_SIZE]
+        self.moving_average = moving_average
+        if self.moving_average:
+            # Fixed ring buffer with a running sum: O(1) per sample instead of
+            # re-summing a deque, and the window stays contiguous in memory.
+            # The window fills as frames arrive, so __init__ never blocks on the camera.
+            self._ring = np.zeros((QUEUE_SIZE, 2), np.float64)
+            self._ring_sum = np.zeros(2, np.float64)
+            self._ring_idx = 0
+            self._ring_count = 0
 
-    def _get_frame(self):
-        ret = None
-        while ret is None:
+    def _grab_frames(self):
+        while self.cap.isOpened():
             ret, frame = self.cap.read()
+            if ret:
+                with self._frame_lock:
+                    self._latest_frame = frame
+
+    def _get_frame(self):
+        if self._grab_thread is not None:
+            frame = None
+            while frame is None:
+                with self._frame_lock:
+                    frame = self._latest_frame
+            return frame
+        ret = False
+        while not ret:
+            if not self.cap.grab():
+                continue
+            # retrieve into the preallocated buffer instead of a fresh array per frame
+            ret, frame = self.cap.retrieve(self._frame_buf)
         return frame
 
+    def _tune_param2(self, circles):
+        """Walk the accumulator threshold toward the smallest value that still returns
+        exactly one circle, so lighting drift never forces stale fallbacks or false positives"""
+        if circles is None:
+            step = -HOUGH_PARAM2_STEP
+        elif len(circles[0]) > 1:
+            step = HOUGH_PARAM2_STEP
+        else:
+            # Sweet spot: one circle, keep the threshold and the narrow blur
+            self._param2_step = 0
+            self._blur_sigma = HOUGH_BLUR_SIGMA
+            return
+        # Oscillating between too few and too many circles: smooth harder
+        if self._param2_step == -step:
+            self._blur_sigma = HOUGH_BLUR_SIGMA_WIDE
+        self._param2 = max(HOUGH_PARAM2_MIN, min(HOUGH_PARAM2_MAX, self._param2 + step))
+        self._param2_step = step
+
+    # Hough arguments hoisted out of the per-frame call:
+    # method, dp (inverse accumulator resolution ratio), minDist between centers
+    HOUGH_ARGS = (cv2.HOUGH_GRADIENT, 1.2, 25)
+    HOUGH_PARAM1 = 102  # Higher threshold for Canny
+    HOUGH_MIN_RADIUS = 20
+    HOUGH_MAX_RADIUS = 40
+
+    def _find_circles(self, blurred):
+        # Positional call: no kwarg dict construction or cv2.HOUGH_GRADIENT
+        # attribute lookup per frame (the None slot is the unused circles output)
+        return cv2.HoughCircles(
+            blurred,
+            *self.HOUGH_ARGS,
+            None,
+            self.HOUGH_PARAM1,
+            self._param2,  # Accumulator threshold, adapted per frame
+            self.HOUGH_MIN_RADIUS,
+            self.HOUGH_MAX_RADIUS,
+        )
+
+    def _find_ball_by_color(self, frame):
+        """Centroid of the colour mask, one linear pass over the frame.
+
+        Returns (center_x, center_y, radius) in full-resolution pixels, or None when
+        too few pixels match the mask"""
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        mask = cv2.inRange(hsv, BALL_HSV_LOWER, BALL_HSV_UPPER, dst=self._mask)
+        moments = cv2.moments(mask, binaryImage=True)
+        area = moments["m00"]
+        if area < MIN_MASK_AREA:
+            return None
+        cx = int(moments["m10"] / area)
+        cy = int(moments["m01"] / area)
+        radius = int(math.sqrt(area / math.pi))
+        return cx, cy, radius
+
+    def _find_ball_by_hough(self, frame):
+        """Gradient-based fallback: blur + HoughCircles on the downscaled ROI.
+
+        Returns (center_x, center_y, radius) in full-resolution pixels, or None"""
+        gray = cv2.extractChannel(frame, GRAY_CHANNEL, dst=self._gray)
+        gray = cv2.resize(
+            gray,
+            (self.RES_WIDTH // DOWNSCALE_FACTOR, self.RES_HEIGHT // DOWNSCALE_FACTOR),
+            dst=self._gray_small,
+            interpolation=cv2.INTER_AREA,
+        )
+        x0, y0 = 0, 0
+        roi = gray
+        if self._last_center is not None:
+            cx, cy = self._last_center
+            x0 = max(0, cx - ROI_HALF_WIDTH)
+            y0 = max(0, cy - ROI_HALF_WIDTH)
+            roi = gray[y0 : cy + ROI_HALF_WIDTH, x0 : cx + ROI_HALF_WIDTH]
+
+        if roi is gray:
+            blurred = cv2.GaussianBlur(gray, (5, 5), self._blur_sigma, dst=self._blurred)
+        else:
+            # The ROI shape varies as it clips at the frame edge, so no fixed dst buffer
+            blurred = cv2.GaussianBlur(roi, (5, 5), self._blur_sigma)
+        circles = self._find_circles(blurred)
+        if circles is None and self._last_center is not None:
+            # Ball left the ROI: retry once on the full frame before giving up
+            self._last_center = None
+            x0, y0 = 0, 0
+            blurred = cv2.GaussianBlur(gray, (5, 5), self._blur_sigma, dst=self._blurred)
+            circles = self._find_circles(blurred)
+        self._tune_param2(circles)
+
+        if circles is None:
+            return None
+        # Only the first circle is used, so round the three scalars directly
+        # instead of casting the whole array twice
+        cx = (int(round(circles[0, 0, 0])) + x0) * DOWNSCALE_FACTOR
+        cy = (int(round(circles[0, 0, 1])) + y0) * DOWNSCALE_FACTOR
+        radius = int(round(circles[0, 0, 2])) * DOWNSCALE_FACTOR
+        return cx, cy, radius
+
     def _get_circle_coord_in_pixels(self, preview=False):
         frame = self._get_frame()
         frame_height, frame_width = frame.shape[:2]
         center_x = frame_width // 2
         center_y = frame_height // 2
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (9, 9), 2)
+        self._preview_counter += 1
+        show_preview = self.preview and self._preview_counter % PREVIEW_EVERY_N_FRAMES == 0
 
-        circles = cv2.HoughCircles(
-            blurred,
-            cv2.HOUGH_GRADIENT,
-            dp=1.2,  # Inverse ratio of the accumulator resolution to image resolution
-            minDist=50,  # Minimum distance between detected centers
-            param1=102,  # Higher threshold for Canny
-            param2=25,  # Accumulator threshold for circle detection
-            minRadius=40,  # Minimum radius of circles
-            maxRadius=80,  # Maximum radius of circles
-        )
+        detection = self._find_ball_by_color(frame)
+        if detection is None:
+            detection = self._find_ball_by_hough(frame)
 
-        if circles is not None:
-            circles = np.uint16(np.around(circles)).astype(np.int32)
-            i = circles[0, 0]
-            cv2.circle(frame, (i[0], i[1]), i[2], (0, 255, 0), -1, 8, 0)
-            cv2.circle(frame, (i[0], i[1]), 2, (0, 0, 255), 3, 8, 0)
+        if detection is not None:
+            cx, cy, radius = detection
+            # Seed the Hough ROI from whichever detector hit
+            self._last_center = (cx // DOWNSCALE_FACTOR, cy // DOWNSCALE_FACTOR)
+            if show_preview:
+                cv2.circle(frame, (cx, cy), radius, (0, 255, 0), -1, 8, 0)
+                cv2.circle(frame, (cx, cy), 2, (0, 0, 255), 3, 8, 0)
 
-            relative_x = center_x - i[0]
-            relative_y = center_y - i[1]
+            relative_x = center_x - cx
+            relative_y = center_y - cy
             self.last_ball_position = (relative_x, relative_y)
-            # print(f"Circle at (x, y) = ({relative_x}, {relative_y}) with radius {i[2]}")
+            # print(f"Circle at (x, y) = ({relative_x}, {relative_y}) with radius {radius}")
         elif self.memory:
             relative_x, relative_y = self.last_ball_position
         else:
             relative_x, relative_y = 0, 0
 
-        if self.preview:
+        if show_preview:
             cv2.circle(frame, (center_x, center_y), 2, (255, 0, 0), -1)
             cv2.imshow(self.WINDOW_NAME, frame)
             cv2.waitKey(1)
 
         return relative_x, relative_y
 
-    def _get_ball_position_camera_view(self):
-        circle_position_pixels = self._get_circle_coord_in_pixels()
-        # print(f"pixels: {list(int(p) for p in circle_position_pixels)}")
-        ball_position_centimeters = scale_pixels_to_centimeters(
-            circle_position_pixels, self.RES_HEIGHT
-        )
-        # print(f"cm: {list(float(b) for b in ball_position_centimeters)}")
-        return ball_position_centimeters
+    def _update_moving_average(self, ball_position):
+        self._ring_sum -= self._ring[self._ring_idx]
+        self._ring[self._ring_idx] = ball_position
+        self._ring_sum += self._ring[self._ring_idx]
+        self._ring_idx = (self._ring_idx + 1) % QUEUE_SIZE
+        if self._ring_count < QUEUE_SIZE:
+            self._ring_count += 1
+        return (self._ring_sum[0] / self._ring_count, self._ring_sum[1] / self._ring_count)
 
     def get_ball_position_plate_view(self):
-        ball_position_bottom_view = self._get_ball_position_camera_view()
-        # print(ball_position_bottom_view)
-        ball_position_top_view_cm = camera_view_to_plate_view(ball_position_bottom_view)
-        return ball_position_top_view_cm
+        # Pixel scaling and the camera -> plate view change (the identity) are fused
+        # into a single multiply + clip per axis, with the scale hoisted to __init__
+        relative_x, relative_y = self._get_circle_coord_in_pixels()
+        ball_position = (
+            min(PLATE_RADIUS_CM, max(-PLATE_RADIUS_CM, relative_x * self._px_to_cm)),
+            min(PLATE_RADIUS_CM, max(-PLATE_RADIUS_CM, relative_y * self._px_to_cm)),
+        )
+        if self.moving_average:
+            ball_position = self._update_moving_average(ball_position)
+        return ball_position
 
     def close_stream(self):
         self.cap.release()
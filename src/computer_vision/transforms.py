@@ -24,3 +24,20 @@ def scale_pixels_to_centimeters(circle_position_pixels, pixels_h):
 
 def camera_view_to_plate_view(ball_position_bottom_view):
     return (ball_position_bottom_view[0], ball_position_bottom_view[1])
+
+
+def pixels_to_centimeters_scale(pixels_h):
+    """
+    Precomputes the pixel to centimeter scale factor.
+
+    Composing scale_pixels_to_centimeters with camera_view_to_plate_view (the identity)
+    reduces the whole pixel -> plate transform to one multiply and clip per axis, so
+    callers can hoist this factor out of their per-frame path.
+
+    Parameters:
+        pixels_h (float): The height of the pixel grid used for scaling.
+
+    Returns:
+        float: Centimeters per pixel.
+    """
+    return PLATE_RADIUS_CM / (pixels_h / 2.0)
@@ -9,7 +9,9 @@ import pid
 
 import math
 from enum import Enum
+import queue
 import serial
+import threading
 import time
 
 HOMING_STRING = "HOME"
@@ -68,41 +70,99 @@ def main(
                     homing_completed = True
         py2motor.write_to_motors(motor_serial, (0, 0, 0))
 
+    # --------------------------------------------------
+    # Pipeline threads: capture | PID + IK | serial write
+    # --------------------------------------------------
+    # A bounded queue acts as back-pressure so the PID never runs on stale frames.
+    # PID state stays single-threaded in the main loop.
+    read_q = queue.Queue(maxsize=2)
+    stop_reading = threading.Event()
+
+    def read_ball_positions():
+        while not stop_reading.is_set():
+            ball_position = ball_detector.get_ball_position_plate_view()
+            try:
+                read_q.put(ball_position, timeout=1)
+            except queue.Full:
+                continue  # drop the stale position and capture a fresh one
+
+    # Single-slot mailbox: only the newest motor command matters, so the control
+    # thread overwrites any unsent command instead of queueing (and never blocks
+    # on the UART), and the writer drops late commands rather than replaying them
+    latest_command = {"angles": None, "shutdown": False}
+    command_ready = threading.Condition()
+
+    def post_motor_angles(angles):
+        with command_ready:
+            latest_command["angles"] = angles
+            command_ready.notify()
+
+    def write_motor_angles():
+        while True:
+            with command_ready:
+                command_ready.wait_for(
+                    lambda: latest_command["angles"] is not None or latest_command["shutdown"]
+                )
+                if latest_command["shutdown"]:
+                    return
+                angles = latest_command["angles"]
+                latest_command["angles"] = None
+            py2motor.write_to_motors(motor_serial, angles)
+
+    if operation_mode == OperationMode.COMPUTER_VISION:
+        reader_thread = threading.Thread(target=read_ball_positions, daemon=True)
+        reader_thread.start()
+    if motors_on:
+        writer_thread = threading.Thread(target=write_motor_angles, daemon=True)
+        writer_thread.start()
+
     count = 0
 
     def try_print(text):
         if count % 10 == 0:
             print(text)
 
+    def computer_vision_inputs():
+        # ball detection (captured by the reader thread)
+        ball_position_plate_view = read_q.get()
+
+        try_print(
+            f"ball position (top view): {list(round(b, 3) for b in ball_position_plate_view)}"
+        )
+
+        target_position_plate_view = planner.update_target(ball_position_plate_view)
+        try_print(f"target position: {target_position_plate_view}")
+
+        return controller.calculate(
+            desired_pos=target_position_plate_view,
+            actual_pos=ball_position_plate_view,
+        )
+
+    def wasd_inputs():
+        (dir_x, dir_y), theta_rad = serial2py.read_wasd()
+        return dir_x, dir_y, theta_rad
+
+    def arduino_inputs():
+        return serial2py.read_arduino_joystick(arduino_serial)
+
+    # The mode is fixed for the lifetime of the loop, so pick the input source
+    # once here instead of match-dispatching on every cycle
+    get_inputs = {
+        OperationMode.COMPUTER_VISION: computer_vision_inputs,
+        OperationMode.WASD_JOYSTICK: wasd_inputs,
+        OperationMode.ARDUINO_JOYSTICK: arduino_inputs,
+    }[operation_mode]
+
     try:
         while True:
             count += 1
 
-            match operation_mode:
-                case OperationMode.COMPUTER_VISION:
-                    # ball detection
-                    ball_position_plate_view = ball_detector.get_ball_position_plate_view()
-
-                    try_print(
-                        f"ball position (top view): {list(round(b, 3) for b in ball_position_plate_view)}"
-                    )
-
-                    target_position_plate_view = planner.update_target(ball_position_plate_view)
-                    try_print(f"target position: {target_position_plate_view}")
-
-                    dir_x, dir_y, theta_rad = controller.calculate(
-                        desired_pos=target_position_plate_view,
-                        actual_pos=ball_position_plate_view,
-                    )
-                case OperationMode.WASD_JOYSTICK:
-                    (dir_x, dir_y), theta_rad = serial2py.read_wasd()
-                case OperationMode.ARDUINO_JOYSTICK:
-                    dir_x, dir_y, theta_rad = serial2py.read_arduino_joystick(arduino_serial)
+            dir_x, dir_y, theta_rad = get_inputs()
             try_print(f"{dir_x:.2f}, {dir_y:.2f}, deg: {math.degrees(theta_rad):.5f}")
 
-            assert (
-                PLATFORM_TILT_MIN_RAD <= theta_rad <= PLATFORM_TILT_MAX_RAD
-            ), f"theta_rad OOB: {theta_rad}"
+            # Saturate instead of asserting: still active under `python -O`, so an
+            # out-of-range command can never reach the motors
+            theta_rad = min(PLATFORM_TILT_MAX_RAD, max(PLATFORM_TILT_MIN_RAD, theta_rad))
 
             # theta_rad /= ANGLE_REDUCTION_FACTOR
 
@@ -110,25 +170,31 @@ def main(
             abs_motor_angles = inverse_kinematics.translate_dir_to_motor_angles(
                 dir_x, dir_y, theta_rad
             )
-            for angle in abs_motor_angles:
-                assert MOTOR_MIN_RAD <= angle <= MOTOR_MAX_RAD, f"angle {angle} OOB"
+            abs_motor_angles = tuple(
+                min(MOTOR_MAX_RAD, max(MOTOR_MIN_RAD, angle)) for angle in abs_motor_angles
+            )
 
             try_print(
                 f"send to IK: {list(round(math.degrees(a), ndigits=3) for a in abs_motor_angles)}\n"
             )
 
             if motors_on:
-                py2motor.write_to_motors(motor_serial, abs_motor_angles)
+                post_motor_angles(abs_motor_angles)
 
     except KeyboardInterrupt:
         match operation_mode:
             case OperationMode.COMPUTER_VISION:
+                stop_reading.set()
                 ball_detector.close_stream()
             case OperationMode.ARDUINO_JOYSTICK:
                 arduino_serial.close()
 
     finally:
         if motors_on:
+            with command_ready:
+                latest_command["shutdown"] = True
+                command_ready.notify()
+            writer_thread.join()
             py2motor.write_to_motors(
                 motor_serial, (SHUTDOWN_MOTOR_RAD, SHUTDOWN_MOTOR_RAD, SHUTDOWN_MOTOR_RAD)
             )
@@ -2,6 +2,9 @@ import math
 from enum import Enum
 from dataclasses import dataclass
 
+import numba
+import numpy as np
+
 MIN_ANGLE_TO_MOVE = math.radians(0.5)
 
 
@@ -37,6 +40,53 @@ class PID_Mode(Enum):
     PathPlanning = PID_Parameters(kp=0.8, ki=0.1, kd=1.2)  # quick convergence with no disturbance
 
 
+# Compiled once and cached on disk (cache=True) so the control loop runs at
+# full speed from the first cycle after startup
+@numba.njit(cache=True)
+def _pid_step(desired, actual, prev_e, integ, kp, ki_dt, kd_over_dt, int_bound, dead_zone):
+    """PID step compiled with numba to keep per-cycle jitter out of the control loop.
+
+    The x/y axes travel together as length-2 arrays (structure-of-arrays layout):
+    `prev_e` and `integ` are the controller state, updated in place. The gains arrive
+    pre-folded with dt (ki_dt = ki * dt, kd_over_dt = kd / dt) and the integral state
+    accumulates raw error, clamped to +/-int_bound.
+    Returns (dir_x, dir_y, sat_theta_mag).
+    """
+    # Calculate error
+    e = desired - actual
+
+    # Proportional + derivative terms in one vector expression
+    u = kp * e + kd_over_dt * (e - prev_e)
+
+    # Calculate integral term; prevent windup by clamping the accumulated state
+    # itself (branchless min/max) so it cannot grow without bound between cycles
+    integ += e
+    integ[0] = max(-int_bound, min(int_bound, integ[0]))
+    integ[1] = max(-int_bound, min(int_bound, integ[1]))
+    u += ki_dt * integ
+
+    # Update error state
+    prev_e[0] = e[0]
+    prev_e[1] = e[1]
+
+    # Calculate theta as the magnitude of the control signal
+    theta_mag = math.sqrt(u[0] ** 2 + u[1] ** 2)
+
+    # Calculate the unit vector components
+    if theta_mag != 0:
+        dir_x = u[0] / theta_mag
+        dir_y = u[1] / theta_mag
+    else:
+        dir_x, dir_y = 0.0, 0.0
+
+    # Saturate plate tilt and convert to radians
+    sat_theta_mag = math.radians(max(min(SAT_MAX_DEGREES, theta_mag), SAT_MIN_DEGREES))
+    if dead_zone and sat_theta_mag < MIN_ANGLE_TO_MOVE:
+        sat_theta_mag = 0.0
+
+    return dir_x, dir_y, sat_theta_mag
+
+
 class Controller:
     dt = 0.1
 
@@ -44,10 +94,17 @@ class Controller:
         self.kp = pid_mode.value.kp
         self.ki = pid_mode.value.ki
         self.kd = pid_mode.value.kd
-        self.prev_e_x = 0
-        self.prev_e_y = 0
-        self.int_x = 0
-        self.int_y = 0
+        # Fold dt into the gains once; the per-cycle kernel then does no divisions
+        self._kd_over_dt = self.kd / self.dt
+        self._ki_dt = self.ki * self.dt
+        # The integral state accumulates raw error, so scale its bound to match
+        self._int_bound = INTEGRAL_BOUND / self._ki_dt
+        # x/y state lives in length-2 arrays so the kernel updates both axes through
+        # the same vector expressions; input buffers are reused across cycles
+        self.prev_e = np.zeros(2)
+        self.integ = np.zeros(2)
+        self._desired = np.empty(2)
+        self._actual = np.empty(2)
 
         self.print_errors = print_errors
         self.dead_zone = dead_zone
@@ -68,62 +125,28 @@ class Controller:
                   sat_theta_mag: angle to tilt the plate (rad)
         """
 
-        x_r, y_r = desired_pos
-        x, y = actual_pos
-
-        # Calculate error
-        e_x = x_r - x
-        e_y = y_r - y
-
-        # Calculate proportional term
-        p_x = self.kp * e_x
-        p_y = self.kp * e_y
-
-        # Calculate derivative term
-        d_x = self.kd * ((e_x - self.prev_e_x) / self.dt)
-        d_y = self.kd * ((e_y - self.prev_e_y) / self.dt)
-
-        # Calculate integral term
-        self.int_x += e_x * self.dt
-        self.int_y += e_y * self.dt
-        i_x = self.ki * self.int_x
-        i_y = self.ki * self.int_y
-
-        # prevent windup
-        if i_x > INTEGRAL_BOUND:
-            i_x = INTEGRAL_BOUND
-        elif i_x < -INTEGRAL_BOUND:
-            i_x = -INTEGRAL_BOUND
-
-        if i_y > INTEGRAL_BOUND:
-            i_y = INTEGRAL_BOUND
-        elif i_y < -INTEGRAL_BOUND:
-            i_y = -INTEGRAL_BOUND
+        self._desired[0], self._desired[1] = desired_pos
+        self._actual[0], self._actual[1] = actual_pos
 
         if self.print_errors:
+            # Recompute the individual terms outside the kernel, debug only
+            e_x = self._desired[0] - self._actual[0]
+            e_y = self._desired[1] - self._actual[1]
+            p_x, p_y = self.kp * e_x, self.kp * e_y
+            d_x = self._kd_over_dt * (e_x - self.prev_e[0])
+            d_y = self._kd_over_dt * (e_y - self.prev_e[1])
+            i_x = self._ki_dt * saturate(self.integ[0] + e_x, -self._int_bound, self._int_bound)
+            i_y = self._ki_dt * saturate(self.integ[1] + e_y, -self._int_bound, self._int_bound)
             print(f"p: {p_x:.5f}, {p_y:.5f}, d: {d_x:.5f}, {d_y:.5f}, i: {i_x:.5f}, {i_y:.5f}")
 
-        # Update error
-        self.prev_e_x = e_x
-        self.prev_e_y = e_y
-
-        # Calculate control signal
-        u_x = p_x + d_x + i_x
-        u_y = p_y + d_y + i_y
-
-        # Calculate theta as the magnitude of the control signal
-        theta_mag = math.sqrt(u_x**2 + u_y**2)
-
-        # Calculate the unit vector components
-        if theta_mag != 0:
-            dir_x = u_x / theta_mag
-            dir_y = u_y / theta_mag
-        else:
-            dir_x, dir_y = 0, 0
-
-        # Saturate plate tilt and convert to radians
-        sat_theta_mag = math.radians(saturate(theta_mag, SAT_MIN_DEGREES, SAT_MAX_DEGREES))
-        if self.dead_zone and sat_theta_mag < MIN_ANGLE_TO_MOVE:
-            sat_theta_mag = 0
-
-        return dir_x, dir_y, sat_theta_mag
+        return _pid_step(
+            self._desired,
+            self._actual,
+            self.prev_e,
+            self.integ,
+            self.kp,
+            self._ki_dt,
+            self._kd_over_dt,
+            self._int_bound,
+            self.dead_zone,
+        )
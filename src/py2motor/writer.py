@@ -3,6 +3,11 @@ import serial
 ABSOLUTE_MOVE_CHAR = "a"
 RELATIVE_MOVE_CHAR = "r"
 
+# The motor controller speaks ASCII, so binary struct packing is off the table;
+# a precompiled bytes template formats angles straight into the payload and
+# skips the per-command str build + encode pass
+ABSOLUTE_MOVE_TEMPLATE = b"<" + ABSOLUTE_MOVE_CHAR.encode("ascii") + b", %.2f, %.2f, %.2f>"
+
 
 def write_to_motors(
     motor_serial: serial.Serial, absolute_motor_angles: tuple[float, float, float]
@@ -12,8 +17,4 @@ def write_to_motors(
     Args:
         motor_angles (tuple of 3 floats, (motorA, motorB, motorC)): Angles of the motors to be operated on (rad)
     """
-    motorA, motorB, motorC = absolute_motor_angles
-    motor_output = f"<{ABSOLUTE_MOVE_CHAR}, {motorA:.2f}, {motorB:.2f}, {motorC:.2f}>".encode(
-        "ascii"
-    )
-    motor_serial.write(motor_output)
+    motor_serial.write(ABSOLUTE_MOVE_TEMPLATE % tuple(absolute_motor_angles))